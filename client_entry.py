@@ -1,12 +1,12 @@
-import cv2
 import time
+IMPORT_START = time.time()
+
+import cv2
 import re
 import socket
-from ultralytics import YOLO
-import firebase_admin
-from firebase_admin import credentials, firestore
-import easyocr
 import logging
+from models import get_db, get_plate_model, get_reader, warm_up
+IMPORT_TIME = time.time() - IMPORT_START
 
 HOST = '127.0.0.1'
 PORT = 12346
@@ -23,12 +23,6 @@ logger.setLevel(logging.INFO)
 handler = logging.StreamHandler()
 handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 logger.addHandler(handler)
-plate_model = YOLO("license_plate_detector.pt", verbose=False)
-reader = easyocr.Reader(['en'], gpu=True)
-
-cred = credentials.Certificate("psio-parking-firebase-adminsdk-gl8z1-55d95c00aa.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
 
 
 def is_valid_license_plate(plate_text):
@@ -37,7 +31,7 @@ def is_valid_license_plate(plate_text):
 
 
 def check_plate_in_database(plate_text):
-    plates_ref = db.collection("parking_logs")
+    plates_ref = get_db().collection("parking_logs")
     return bool(plates_ref.where("license_plate", "==", plate_text).get())
 
 
@@ -52,21 +46,29 @@ def send_plate_to_server(plate_text):
 
 
 def process_entry_camera():
+    logger.info(f"Module imports took {IMPORT_TIME:.2f}s")
+    start_time = time.time()
+    warm_up()
+    get_db()
+    logger.info(f"Models loaded and warmed up in {time.time() - start_time:.2f}s")
+
     cap = cv2.VideoCapture(0)
     last_plate_text = None
+    first_frame = True
 
     while cap.isOpened():
         ret, frame = cap.read()
         if not ret:
             break
+        frame_start = time.time()
 
         plate_text = None
-        plate_results = plate_model(frame)
+        plate_results = get_plate_model()(frame)
         for plate_result in plate_results:
             for box in plate_result.boxes:
                 x1, y1, x2, y2 = map(int, box.xyxy[0])
                 plate_img = frame[y1:y2, x1:x2]
-                result = reader.readtext(plate_img)
+                result = get_reader().readtext(plate_img)
                 if result:
                     plate_text = result[0][1].replace(" ", "").strip()
 
@@ -79,6 +81,10 @@ def process_entry_camera():
                 else:
                     print(f"Plate {plate_text} is not authorized.")
 
+        if first_frame:
+            logger.info(f"First frame processed in {time.time() - frame_start:.2f}s")
+            first_frame = False
+
         cv2.imshow("Entry Camera", frame)
 
         if cv2.waitKey(1) & 0xFF == ord('q'):
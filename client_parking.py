@@ -1,14 +1,17 @@
+import time
+IMPORT_START = time.time()
+
 import threading
 
 import cv2
-import time
 import re
 import socket
-from ultralytics import YOLO
-import easyocr
 from _datetime import datetime
 import logging
 import uuid
+from track_archive import TrackArchive
+from models import get_car_model, get_plate_model, get_reader, warm_up
+IMPORT_TIME = time.time() - IMPORT_START
 
 
 CAMERA_INDEX = 2
@@ -33,6 +36,10 @@ VIOLATION_TIME_THRESHOLD = 7
 MOVEMENT_THRESHOLD = 5
 TRACK_TIMEOUT = 5
 
+TRACK_ARCHIVE_DIR = "track_archive"
+TRACK_ARCHIVE_MAX_FRAMES = 10000
+TRACK_ARCHIVE_MAX_AGE = 300
+
 
 HOST = '127.0.0.1'
 PORT = 12346
@@ -53,17 +60,14 @@ handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)
 logger.addHandler(handler)
 
 
-car_model = YOLO("best_car_detection_812.pt", verbose=False)
-plate_model = YOLO("license_plate_detector.pt", verbose=False)
-reader = easyocr.Reader(['en'], gpu=True)
-
-
 tracked_cars = {}
 car_positions = {}
 violation_tracker = {}
 violation_notified = set()
 car_plates = {}
 exited_cars = set()
+spot_parked_since = {}
+spot_last_occupied = {}
 
 
 class TrackedCar:
@@ -71,12 +75,22 @@ class TrackedCar:
         self.id = uuid.uuid4()
         self.positions = [(x1, y1, x2, y2)]
         self.last_seen = time.time()
+        self.timestamps = [self.last_seen]
+        self.statuses = [None]
+        self.spot_id = None
+        self.pending_spot_id = None
+        self.pending_since = None
         self.plate_text = plate_text
         self.in_exit_area = False
 
     def update_position(self, x1, y1, x2, y2):
         self.positions.append((x1, y1, x2, y2))
         self.last_seen = time.time()
+        self.timestamps.append(self.last_seen)
+        self.statuses.append(None)
+
+    def set_status(self, status):
+        self.statuses[-1] = status
 
 
 def is_valid_license_plate(plate_text):
@@ -89,12 +103,12 @@ def detect_license_plate(frame, car_bbox):
     car_img = frame[y1:y2, x1:x2]
 
     try:
-        plate_results = plate_model(car_img)
+        plate_results = get_plate_model()(car_img)
         for plate_result in plate_results:
             for box in plate_result.boxes:
                 px1, py1, px2, py2 = map(int, box.xyxy[0])
                 plate_img = car_img[py1:py2, px1:px2]
-                result = reader.readtext(plate_img)
+                result = get_reader().readtext(plate_img)
                 if result:
                     plate_text = result[0][1].replace(" ", "").strip()
                     if is_valid_license_plate(plate_text):
@@ -106,7 +120,7 @@ def detect_license_plate(frame, car_bbox):
 
 def detect_cars(frame):
     cars = []
-    results = car_model(frame)
+    results = get_car_model()(frame)
 
     for result in results:
         for box, cls, conf in zip(result.boxes.xyxy, result.boxes.cls, result.boxes.conf):
@@ -173,7 +187,30 @@ def notify_server_violation(violation_type, car_id, plate_text=None, violation_t
     except Exception as e:
         print(f"Error sending violation: {e}")
 
-def send_exit_data(tracked_car_id):
+def send_park_data(tracked_car_id, spot_id):
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.connect((HOST, PORT))
+
+            s.sendall("CAR_PARKED".encode())
+            time.sleep(0.1)
+
+            park_data = f"{tracked_car_id},{spot_id}"
+            s.sendall(park_data.encode())
+
+            response = s.recv(1024).decode()
+            print(f"Server response: {response}")
+
+    except Exception as e:
+        print(f"Error sending park data: {e}")
+
+
+def notify_server_park(tracked_car, spot_id):
+    thread = threading.Thread(target=send_park_data, args=(tracked_car.id, spot_id))
+    thread.start()
+
+
+def send_exit_data(tracked_car_id, spot_id=None, dwell_seconds=None):
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.connect((HOST, PORT))
@@ -181,7 +218,8 @@ def send_exit_data(tracked_car_id):
                 s.sendall("CAR_EXITED".encode())
                 time.sleep(0.1)
 
-                exit_data = f"{tracked_car_id}"
+                dwell = "" if dwell_seconds is None else f"{dwell_seconds:.0f}"
+                exit_data = f"{tracked_car_id},{spot_id or ''},{dwell}"
                 s.sendall(exit_data.encode())
 
                 response = s.recv(1024).decode()
@@ -192,10 +230,41 @@ def send_exit_data(tracked_car_id):
 
 
 def notify_server_exit(tracked_car):
-    thread = threading.Thread(target=send_exit_data, args=(tracked_car.id,))
+    dwell_seconds = None
+    parked_since = spot_parked_since.pop(tracked_car.spot_id, None)
+    if parked_since is not None:
+        dwell_seconds = time.time() - parked_since
+    thread = threading.Thread(target=send_exit_data, args=(tracked_car.id, tracked_car.spot_id, dwell_seconds))
     thread.start()
 
 
+def update_parked_spot(tracked_car, spot_id, current_time, is_moving):
+    if tracked_car.spot_id == spot_id and spot_id in spot_parked_since:
+        return
+    if tracked_car.pending_spot_id != spot_id or is_moving:
+        tracked_car.pending_spot_id = spot_id
+        tracked_car.pending_since = current_time
+        return
+    if current_time - tracked_car.pending_since < PARKING_THRESHOLD:
+        return
+
+    tracked_car.pending_spot_id = None
+    if tracked_car.spot_id is not None and tracked_car.spot_id != spot_id:
+        spot_parked_since.pop(tracked_car.spot_id, None)
+    tracked_car.spot_id = spot_id
+    if spot_id not in spot_parked_since:
+        spot_parked_since[spot_id] = tracked_car.pending_since
+        notify_server_park(tracked_car, spot_id)
+
+
+def release_empty_spots(occupied_spots, current_time):
+    for spot_id in occupied_spots:
+        spot_last_occupied[spot_id] = current_time
+    for spot_id in list(spot_parked_since):
+        if current_time - spot_last_occupied.get(spot_id, 0) > TRACK_TIMEOUT:
+            del spot_parked_since[spot_id]
+
+
 def check_parking_status(car, tracked_car):
     x1, y1, x2, y2, conf, plate_text = car
     current_time = time.time()
@@ -215,6 +284,10 @@ def check_parking_status(car, tracked_car):
             overlapping_spots.append(spot_id)
             overlap_values.append(overlap)
 
+    in_single_spot = len(overlapping_spots) == 1 and overlap_values[0] > 0.6
+    if not in_single_spot:
+        tracked_car.pending_spot_id = None
+
     exit_overlap = calculate_overlap((x1, y1, x2, y2), EXIT_AREA)
     if exit_overlap > OVERLAP_THRESHOLD:
         tracked_car.in_exit_area = True
@@ -228,9 +301,10 @@ def check_parking_status(car, tracked_car):
         if tracked_car.id in violation_notified:
             violation_notified.remove(tracked_car.id)
 
-    if len(overlapping_spots) == 1 and overlap_values[0] > 0.6:
+    if in_single_spot:
         if tracked_car.id in violation_tracker:
             del violation_tracker[tracked_car.id]
+        update_parked_spot(tracked_car, overlapping_spots[0], current_time, is_moving)
         return "correct", overlapping_spots[0]
 
     if len(overlapping_spots) > 1:
@@ -275,7 +349,7 @@ def get_occupied_spots(cars):
     return occupied
 
 
-def update_tracked_cars(cars):
+def update_tracked_cars(cars, track_archive):
     global tracked_cars
     new_tracked_cars = {}
     assigned_car_ids = set()
@@ -307,6 +381,7 @@ def update_tracked_cars(cars):
             else:
                 new_tracked_cars[tracked_car_id] = tracked_car
     for tracked_car_id in tracked_cars_to_remove:
+        track_archive.append(tracked_cars[tracked_car_id])
         del tracked_cars[tracked_car_id]
 
     tracked_cars = new_tracked_cars
@@ -374,21 +449,33 @@ def draw_objects(frame, cars):
                     cv2.putText(frame, f"Plate: {plate_text}", (x1, y2 + 20),
                                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
 
+    return occupied_spots
+
 
 def monitor_parking():
+    logger.info(f"Module imports took {IMPORT_TIME:.2f}s")
+    start_time = time.time()
+    warm_up(RESOLUTION, include_car_model=True)
+    logger.info(f"Models loaded and warmed up in {time.time() - start_time:.2f}s")
+
     cap = cv2.VideoCapture(CAMERA_INDEX)
     if not cap.isOpened():
         print("Nie można otworzyć kamery parkingowej.")
         return
 
+    track_archive = TrackArchive(TRACK_ARCHIVE_DIR, TRACK_ARCHIVE_MAX_FRAMES, TRACK_ARCHIVE_MAX_AGE)
+    track_archive.start()
+    first_frame = True
+
     try:
         while cap.isOpened():
             ret, frame = cap.read()
             if not ret:
                 break
+            frame_start = time.time()
 
             cars = detect_cars(frame)
-            cars = update_tracked_cars(cars)
+            cars = update_tracked_cars(cars, track_archive)
 
             for tracked_car_id, tracked_car in tracked_cars.items():
                 for car in cars:
@@ -398,16 +485,24 @@ def monitor_parking():
                     tracked_car.positions[-1][3]))
                     if overlap > 0.5:
                         status, spot_id = check_parking_status(car, tracked_car)
+                        tracked_car.set_status(status)
                         if status == "exit_area" and tracked_car.id not in exited_cars:
                             notify_server_exit(tracked_car)
                             exited_cars.add(tracked_car.id)
-            draw_objects(frame, cars)
+            occupied_spots = draw_objects(frame, cars)
+            release_empty_spots(occupied_spots, time.time())
+            if first_frame:
+                logger.info(f"First frame processed in {time.time() - frame_start:.2f}s")
+                first_frame = False
             cv2.imshow("Parking Camera", frame)
 
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
     finally:
+        for tracked_car in tracked_cars.values():
+            track_archive.append(tracked_car)
+        track_archive.close()
         cap.release()
         cv2.destroyAllWindows()
 
@@ -0,0 +1,47 @@
+import functools
+
+import numpy as np
+
+
+CAR_MODEL_PATH = "best_car_detection_812.pt"
+PLATE_MODEL_PATH = "license_plate_detector.pt"
+FIREBASE_CREDENTIALS = "psio-parking-firebase-adminsdk-gl8z1-55d95c00aa.json"
+OCR_LANGUAGES = ['en']
+WARM_UP_RESOLUTION = (640, 480)
+
+
+@functools.lru_cache(maxsize=None)
+def get_car_model():
+    from ultralytics import YOLO
+    return YOLO(CAR_MODEL_PATH, verbose=False)
+
+
+@functools.lru_cache(maxsize=None)
+def get_plate_model():
+    from ultralytics import YOLO
+    return YOLO(PLATE_MODEL_PATH, verbose=False)
+
+
+@functools.lru_cache(maxsize=None)
+def get_reader():
+    import easyocr
+    return easyocr.Reader(OCR_LANGUAGES, gpu=True)
+
+
+@functools.lru_cache(maxsize=None)
+def get_db():
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    cred = credentials.Certificate(FIREBASE_CREDENTIALS)
+    firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+
+def warm_up(resolution=WARM_UP_RESOLUTION, include_car_model=False):
+    width, height = resolution
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+
+    if include_car_model:
+        get_car_model()(frame)
+    get_plate_model()(frame)
+    get_reader().readtext(frame[:64, :256])
@@ -4,11 +4,16 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
 import time
+import uuid
+from collections import defaultdict
 from datetime import datetime
 
 HOST = '127.0.0.1'
 PORT = 12346
 
+ROLLUP_FLUSH_INTERVAL = 60
+DWELL_BUCKETS = (5, 15, 30, 60, 120, 240, 480)
+
 cred = credentials.Certificate("psio-parking-firebase-adminsdk-gl8z1-55d95c00aa.json")
 firebase_admin.initialize_app(cred)
 db = firestore.client()
@@ -17,10 +22,70 @@ vehicle_plate = None
 vehicle_parked = False
 plate_lock = threading.Lock()
 
+pending_rollups = defaultdict(lambda: defaultdict(int))
+rollup_lock = threading.Lock()
 
-def log_vehicle_event(plate_text, status):
+
+def make_doc_name(*parts):
     timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
-    doc_name = f"{plate_text}_{status}_{timestamp}"
+    return "_".join([uuid.uuid4().hex, *map(str, parts), timestamp])
+
+
+def dwell_bucket(dwell_seconds):
+    minutes = dwell_seconds / 60
+    lower = 0
+    for upper in DWELL_BUCKETS:
+        if minutes < upper:
+            return f"{lower}-{upper}m"
+        lower = upper
+    return f"{lower}m+"
+
+
+def record_rollup(*fields, hourly=(), amount=1):
+    now = datetime.now()
+    day = now.strftime("%Y-%m-%d")
+    hour = now.strftime("%H")
+    with rollup_lock:
+        counters = pending_rollups[day]
+        for field in fields:
+            counters[field] += amount
+        for field in hourly:
+            counters[f"hourly.{hour}.{field}"] += amount
+
+
+def flush_rollups():
+    global pending_rollups
+    with rollup_lock:
+        snapshot = pending_rollups
+        pending_rollups = defaultdict(lambda: defaultdict(int))
+
+    for day, counters in snapshot.items():
+        update = {}
+        for field, count in counters.items():
+            *path, leaf = field.split(".")
+            node = update
+            for key in path:
+                node = node.setdefault(key, {})
+            node[leaf] = firestore.Increment(count)
+        update["updated_at"] = firestore.SERVER_TIMESTAMP
+
+        try:
+            db.collection("daily_rollups").document(day).set(update, merge=True)
+        except Exception as e:
+            print(f"Error flushing rollups for {day}: {e}")
+            with rollup_lock:
+                for field, count in counters.items():
+                    pending_rollups[day][field] += count
+
+
+def rollup_flusher():
+    while True:
+        time.sleep(ROLLUP_FLUSH_INTERVAL)
+        flush_rollups()
+
+
+def log_vehicle_event(plate_text, status):
+    doc_name = make_doc_name(plate_text, status)
 
     log_ref = db.collection("entry_logs").document(doc_name)
     log_ref.set({
@@ -28,11 +93,11 @@ def log_vehicle_event(plate_text, status):
         "timestamp": firestore.SERVER_TIMESTAMP,
         "status": status
     })
+    record_rollup(f"totals.{status}", hourly=[status])
     print(f"✅ Log saved as '{doc_name}' for vehicle {plate_text} ({status})")
 
 def log_violation_event(vehicle_id, plate_number, violation_time, violation_type):
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
-    doc_name = f"violation_{vehicle_id}_{timestamp}"
+    doc_name = make_doc_name("violation", vehicle_id)
 
     try:
         log_ref = db.collection("violations").document(doc_name)
@@ -43,14 +108,14 @@ def log_violation_event(vehicle_id, plate_number, violation_time, violation_type
             "timestamp": firestore.SERVER_TIMESTAMP,
             "violation_type": violation_type
         })
+        record_rollup("totals.violation", f"violation_types.{violation_type}", hourly=["violation"])
         print(f"✅ Violation log saved as '{doc_name}' for vehicle with plate {plate_number}")
     except Exception as e:
         print(f"Error saving violation log: {e}")
     return doc_name
 
-def log_exit_event(vehicle_id, status):
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
-    doc_name = f"exit_{vehicle_id}_{timestamp}"
+def log_exit_event(vehicle_id, status, spot_id=None, dwell_seconds=None):
+    doc_name = make_doc_name("exit", vehicle_id)
 
     try:
         log_ref = db.collection("exit_logs").document(doc_name)
@@ -59,6 +124,14 @@ def log_exit_event(vehicle_id, status):
             "timestamp": firestore.SERVER_TIMESTAMP,
             " status": status
         })
+        fields = [f"totals.{status}"]
+        if spot_id:
+            fields.append(f"spots.{spot_id}.{status}")
+        if dwell_seconds is not None:
+            fields.append(f"dwell_histogram.{dwell_bucket(dwell_seconds)}")
+            if spot_id:
+                record_rollup(f"spots.{spot_id}.occupied_seconds", amount=round(dwell_seconds))
+        record_rollup(*fields, hourly=[status])
         print(f"✅ Exit log saved as '{doc_name}' for vehicle with id {vehicle_id}")
     except Exception as e:
         print(f"Error saving exit log: {e}")
@@ -119,6 +192,7 @@ def handle_parking_violation(conn):
         if data:
             violation_data = data.decode().strip()
             vehicle_id, plate_number, violation_time, violation_type = violation_data.split(',')
+            violation_type = violation_type.strip()
 
             try:
                 formatted_time = datetime.strptime(violation_time, "%Y-%m-%d %H:%M:%S")
@@ -141,13 +215,29 @@ def handle_parking_violation(conn):
     finally:
         conn.close()
 
+def handle_parking_event(conn):
+    try:
+        data = conn.recv(1024)
+        if data:
+            vehicle_id, spot_id = data.decode().strip().split(',')
+            print(f"🅿️ Vehicle {vehicle_id} parked in spot {spot_id}.")
+            record_rollup("totals.park", f"spots.{spot_id}.park", hourly=["park"])
+            conn.sendall("Park recorded.".encode())
+    except Exception as e:
+        print(f"Error handling park data: {e}")
+        conn.sendall("Error processing park data.".encode())
+    finally:
+        conn.close()
+
 def handle_exit_camera(conn):
     try:
         data = conn.recv(1024)
         if data:
-            vehicle_id = data.decode().strip()
+            vehicle_id, _, details = data.decode().strip().partition(',')
+            spot_id, _, dwell = details.partition(',')
+            dwell_seconds = float(dwell) if dwell else None
             print(f"🚗 Vehicle {vehicle_id} is exiting.")
-            log_exit_event(vehicle_id, "exit")
+            log_exit_event(vehicle_id, "exit", spot_id or None, dwell_seconds)
             open_exit_gate()
             conn.sendall("Exit gate opened.".encode())
     except Exception as e:
@@ -158,6 +248,8 @@ def handle_exit_camera(conn):
 
 
 def start_server():
+    threading.Thread(target=rollup_flusher, daemon=True).start()
+
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
         server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         server.bind((HOST, PORT))
@@ -180,6 +272,8 @@ def start_server():
 
                 if client_type == "PARKING_VIOLATION":
                     handle_parking_violation(conn)
+                elif client_type == "CAR_PARKED":
+                    handle_parking_event(conn)
                 elif client_type == "CAR_EXITED":
                     handle_exit_camera(conn)
                 elif client_type == "ENTRY_CAMERA":
@@ -188,6 +282,9 @@ def start_server():
                     print(f"[SERVER] Unknown client type: {client_type}")
                     conn.close()
 
+            except KeyboardInterrupt:
+                flush_rollups()
+                raise
             except Exception as e:
                 print(f"[SERVER] Error in main loop: {e}")
                 continue
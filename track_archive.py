@@ -0,0 +1,139 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+ARCHIVE_DIR = "track_archive"
+SEGMENT_MAX_FRAMES = 10000
+SEGMENT_MAX_AGE = 300
+
+STATUSES = (
+    "unknown",
+    "monitoring",
+    "correct",
+    "potential_violation",
+    "wrong_parking",
+    "blocked_way",
+    "exit_area",
+)
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+TRACK_COLUMNS = ("track_id", "plate", "start", "length")
+FRAME_COLUMNS = ("boxes", "status", "timestamp")
+
+
+class TrackArchive:
+    def __init__(self, directory=ARCHIVE_DIR, max_frames=SEGMENT_MAX_FRAMES, max_age=SEGMENT_MAX_AGE):
+        self.directory = directory
+        self.max_frames = max_frames
+        self.max_age = max_age
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def append(self, tracked_car):
+        self.queue.put((
+            tracked_car.id.hex,
+            tracked_car.plate_text or "",
+            tracked_car.positions,
+            tracked_car.statuses,
+            tracked_car.timestamps,
+        ))
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+    def _run(self):
+        tracks = []
+        frame_count = 0
+        oldest = None
+        running = True
+        while running:
+            timeout = None if oldest is None else max(0, oldest + self.max_age - time.time())
+            try:
+                track = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                track = ()
+
+            if track is None:
+                running = False
+            elif track:
+                tracks.append(track)
+                frame_count += len(track[2])
+                if oldest is None:
+                    oldest = time.time()
+
+            if tracks and (not running or frame_count >= self.max_frames or time.time() - oldest >= self.max_age):
+                self._write_segment(tracks)
+                tracks = []
+                frame_count = 0
+                oldest = None
+
+    def _write_segment(self, tracks):
+        try:
+            lengths = np.array([len(track[2]) for track in tracks], dtype=np.int32)
+            columns = {
+                "track_id": np.array([track[0] for track in tracks], dtype="<U32"),
+                "plate": np.array([track[1] for track in tracks]),
+                "start": np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64),
+                "length": lengths,
+                "boxes": np.array([box for track in tracks for box in track[2]], dtype=np.int32).reshape(-1, 4),
+                "status": np.array([STATUS_CODES.get(status, 0) for track in tracks for status in track[3]],
+                                   dtype=np.uint8),
+                "timestamp": np.array([ts for track in tracks for ts in track[4]], dtype=np.float64),
+            }
+
+            os.makedirs(self.directory, exist_ok=True)
+            segments = list_segments(self.directory)
+            segment_index = segment_number(segments[-1]) + 1 if segments else 0
+            name = f"segment_{segment_index:06d}"
+            tmp_path = os.path.join(self.directory, f".{name}.tmp")
+            os.makedirs(tmp_path, exist_ok=True)
+            for column, values in columns.items():
+                np.save(os.path.join(tmp_path, f"{column}.npy"), values)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except Exception as e:
+            print(f"Error writing track archive segment: {e}")
+
+
+def segment_number(path):
+    suffix = os.path.basename(path)[len("segment_"):]
+    return int(suffix) if suffix.isdigit() else None
+
+
+def list_segments(directory=ARCHIVE_DIR):
+    if not os.path.isdir(directory):
+        return []
+    paths = (os.path.join(directory, name) for name in os.listdir(directory) if name.startswith("segment_"))
+    return sorted((path for path in paths if segment_number(path) is not None), key=segment_number)
+
+
+def open_segment(path):
+    return {
+        column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r")
+        for column in TRACK_COLUMNS + FRAME_COLUMNS
+    }
+
+
+def iter_tracks(directory=ARCHIVE_DIR):
+    for path in list_segments(directory):
+        segment = open_segment(path)
+        for track_id, plate, start, length in zip(*(segment[column] for column in TRACK_COLUMNS)):
+            frames = slice(start, start + length)
+            yield {
+                "track_id": str(track_id),
+                "plate": str(plate) or None,
+                "boxes": segment["boxes"][frames],
+                "status": segment["status"][frames],
+                "timestamp": segment["timestamp"][frames],
+            }